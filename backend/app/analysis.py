@@ -0,0 +1,481 @@
+# backend/app/analysis.py
+# Position analysis endpoints' engine side:
+#  - GET /analysis: multi-PV root analysis through a shared LRU cache
+#  - POST /analyze/batch: positions come in as NDJSON, are fanned out over a
+#    process pool (the search is CPU bound, threads would just fight over the GIL)
+#    and results are streamed back as NDJSON in completion order.
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from app import metrics
+from app.game import ai
+from app.game.Game import Game
+from app.game.Piece import Piece
+from app.schemas.analysis import AnalysisResultDTO, PositionDTO
+from app.schemas.move import MoveDTO
+
+WORKERS = int(os.getenv("KAMISADO_ANALYSIS_WORKERS", "0")) or (os.cpu_count() or 1)
+MAX_IN_FLIGHT = WORKERS * 2        # positions submitted but not yet written out
+MAX_LINE_BYTES = 64 * 1024         # one serialized position is ~1.5 KB
+# request body read ahead of the positions being analysed; also how much body can sit unread
+# before a client disconnect goes unnoticed (see BodyBuffer)
+BODY_BUFFER_BYTES = int(os.getenv("KAMISADO_ANALYSIS_BODY_BUFFER", str(1024 * 1024)))
+MAX_DEPTH = 6
+MAX_TIME_LIMIT = 60.0              # seconds per position
+CACHE_SIZE = int(os.getenv("KAMISADO_ANALYSIS_CACHE_SIZE", "1024"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+# batch id -> result queue of a running batch (DELETE pushes _CANCEL into it)
+_batches: Dict[str, asyncio.Queue] = {}
+
+_CANCEL = object()
+
+logger = logging.getLogger("analysis")
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: forking a process that runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def discard_broken_pool(pool: ProcessPoolExecutor) -> None:
+    # A worker died (OOM, segfault): the executor now refuses all work, so the next
+    # get_pool() starts a fresh one. Only if `pool` is still current: every future of
+    # the broken pool reports the breakage, and the first one already replaced it.
+    global _pool
+    if _pool is pool:
+        _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit(fn, *args) -> Tuple[asyncio.Future, ProcessPoolExecutor]:
+    pool = get_pool()
+    try:
+        return asyncio.get_running_loop().run_in_executor(pool, fn, *args), pool
+    except BrokenProcessPool:
+        # broke since the last submit; the work itself is fine, so retry once on a new pool
+        discard_broken_pool(pool)
+        pool = get_pool()
+        return asyncio.get_running_loop().run_in_executor(pool, fn, *args), pool
+
+
+def shutdown_pool(wait: bool = False) -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
+
+
+def game_from_position(position: PositionDTO) -> Game:
+    pieces = [
+        Piece(
+            id=p.id,
+            col=p.col,
+            row=p.row,
+            color=p.color,
+            team=p.team,
+            direction="up" if p.team == "white" else "down",
+        )
+        for p in position.pieces
+    ]
+    return Game.from_state(
+        pieces,
+        turn=position.turn,
+        forced_color=position.forced_color,
+        winner=position.winner,
+        last_player=position.last_player,
+    )
+
+
+def move_dto(move: ai.Move) -> MoveDTO:
+    return MoveDTO(piece_id=move[0], to_col=move[1], to_row=move[2])
+
+
+def analyze_position(
+    index: int, position: PositionDTO, depth: int, time_limit: float
+) -> Tuple[AnalysisResultDTO, Optional[ai.SearchStats]]:
+    # Runs inside a worker process. Stats travel back so the parent can publish metrics.
+    calls_before = metrics.RULES_VALID_MOVES_CALLS.value
+    try:
+        game = game_from_position(position)
+        result = ai.analyze(game, depth, time_limit)
+    except ValueError as e:
+        return AnalysisResultDTO(index=index, id=position.id, error=str(e)), None
+    result.stats.valid_moves_calls = metrics.RULES_VALID_MOVES_CALLS.value - calls_before
+
+    return AnalysisResultDTO(
+        index=index,
+        id=position.id,
+        best_move=move_dto(result.best_move) if result.best_move else None,
+        score=result.score,
+        pv=[move_dto(m) for m in result.pv],
+        depth=result.depth,
+        nodes=result.stats.nodes,
+        elapsed=result.elapsed,
+    ), result.stats
+
+
+# (move, score, pv) with pv frozen so cached entries cannot be mutated by callers
+CachedLine = Tuple[ai.Move, float, Tuple[ai.Move, ...]]
+
+
+@dataclass
+class CacheEntry:
+    depth: int                       # depth the lines were searched to
+    lines: List[CachedLine]
+    # most seconds the iteration at depth + 1 has been given without finishing
+    exhausted_budget: Optional[float] = None
+
+    def answers(self, depth: int, time_limit: float) -> bool:
+        if self.depth >= depth:
+            return True
+        # a miss resumes at depth + 1 with the whole time limit; if that iteration already
+        # failed with at least this much time, searching again cannot get any deeper
+        return self.exhausted_budget is not None and time_limit <= self.exhausted_budget
+
+
+class AnalysisCache:
+    """
+    LRU cache of root analyses shared by every session.
+
+    Keyed by position_key; each entry keeps the deepest analysis of that position with ALL
+    root lines, so any top-K is a slice and a deeper result answers shallower requests.
+    When the next iteration ran out of time, the time it actually had is remembered: a
+    request whose whole time limit is no larger could not finish it either, so that is a
+    hit too.
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()  # sync endpoints run in the threadpool
+
+    def get(self, position: tuple) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(position)
+            if entry is not None:
+                self._entries.move_to_end(position)
+            return entry
+
+    def put(
+        self,
+        position: tuple,
+        depth: int,
+        lines: List[Tuple[ai.Move, float, List[ai.Move]]],
+        exhausted_budget: Optional[float] = None,
+    ) -> CacheEntry:
+        entry = CacheEntry(depth, [(move, score, tuple(pv)) for move, score, pv in lines], exhausted_budget)
+        with self._lock:
+            old = self._entries.get(position)
+            if old is not None and old.depth > depth:
+                entry = old  # never replace a deeper result with a shallower one
+            elif old is not None and old.depth == depth and old.exhausted_budget is not None:
+                entry.exhausted_budget = max(old.exhausted_budget, exhausted_budget or 0.0)
+            self._entries[position] = entry
+            self._entries.move_to_end(position)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+cache = AnalysisCache()
+
+
+def analyze_lines(game: Game, depth: int, time_limit: float) -> Tuple[int, List[CachedLine], bool]:
+    """
+    Multi-PV analysis of the side to move, through the shared cache.
+    Returns (depth searched, all root lines best first, served from cache).
+    """
+    position = game.position_key()
+
+    entry = cache.get(position)
+    if entry is not None and entry.answers(depth, time_limit):
+        if metrics.ENABLED:
+            metrics.ANALYSIS_CACHE_HITS.inc()
+        return entry.depth, entry.lines, True
+
+    if metrics.ENABLED:
+        metrics.ANALYSIS_CACHE_MISSES.inc()
+
+    # a shallower cached result still saves its depths: deepening resumes after it
+    known = (entry.depth, [(m, s, list(pv)) for m, s, pv in entry.lines]) if entry is not None else None
+    result = ai.analyze(game, depth, time_limit, known)
+    ai.record_search(result.stats, result.depth, result.elapsed)
+
+    if not result.lines:
+        return result.depth, [], False
+
+    # cut short by the time limit: remember how long the unfinished iteration had
+    entry = cache.put(position, result.depth, result.lines, result.unfinished_budget)
+    return entry.depth, entry.lines, False
+
+
+def parse_position(line: bytes) -> PositionDTO:
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("Each line must be a JSON object.")
+    return PositionDTO(**data)
+
+
+class BodyBuffer:
+    """
+    Request body chunks read ahead by the pump task in stream_batch, capped at `limit` bytes.
+
+    The pump keeps a receive() pending whenever the buffer has room, which is what lets us see
+    http.disconnect right away instead of after every buffered line has been analysed.
+
+    Limitation: ASGI only reports a disconnect through receive(), and receive() also hands
+    over body. While the buffer is full the pump stops receiving, so a client that sent
+    more than `limit` bytes and then hung up is only noticed once the producer has drained
+    the buffer enough for the pump to receive again (for a ~1.5 KB position, about
+    limit / 1.5 KB positions later, minus the ones never started).
+    """
+
+    def __init__(self, limit: int = BODY_BUFFER_BYTES):
+        self.limit = limit
+        self.size = 0
+        self.finished = False
+        self._chunks: deque = deque()
+        self._changed = asyncio.Condition()
+
+    async def put(self, chunk: bytes) -> None:
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.size < self.limit)
+            self._chunks.append(chunk)
+            self.size += len(chunk)
+            self._changed.notify_all()
+
+    async def finish(self) -> None:
+        async with self._changed:
+            self.finished = True
+            self._changed.notify_all()
+
+    async def get(self) -> Optional[bytes]:
+        # next chunk, or None once the body is complete
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._chunks or self.finished)
+            if not self._chunks:
+                return None
+            chunk = self._chunks.popleft()
+            self.size -= len(chunk)
+            self._changed.notify_all()
+            return chunk
+
+
+async def read_lines(body: BodyBuffer) -> AsyncIterator[Optional[bytes]]:
+    """
+    Split the request body into lines without ever holding more than one line.
+    An oversized line yields None (reported as an error) and is skipped up to its newline.
+    """
+    buffer = b""
+    skipping = False
+
+    while True:
+        chunk = await body.get()
+        if chunk is None:
+            break
+        buffer += chunk
+        while True:
+            nl = buffer.find(b"\n")
+            if nl < 0:
+                break
+            line, buffer = buffer[:nl], buffer[nl + 1:]
+            if skipping:
+                skipping = False
+                continue
+            yield line
+
+        if len(buffer) > MAX_LINE_BYTES:
+            buffer = b""
+            if not skipping:
+                skipping = True
+                yield None
+
+    if buffer and not skipping:
+        yield buffer
+
+
+def new_batch() -> str:
+    batch_id = uuid.uuid4().hex
+    _batches[batch_id] = asyncio.Queue()
+    return batch_id
+
+
+def cancel_batch(batch_id: str) -> bool:
+    results = _batches.get(batch_id)
+    if results is None:
+        return False
+    results.put_nowait(_CANCEL)
+    return True
+
+
+def _encode(result: AnalysisResultDTO) -> bytes:
+    return (json.dumps(jsonable_encoder(result)) + "\n").encode()
+
+
+async def stream_batch(
+    request: Request, batch_id: str, depth: int, time_limit: float
+) -> AsyncIterator[bytes]:
+    """
+    Pump task: receives the request body into a BodyBuffer and watches for the disconnect.
+    Producer task: reads positions and submits them to the pool, but only while fewer than
+    MAX_IN_FLIGHT results are outstanding. Together with BODY_BUFFER_BYTES of read-ahead,
+    memory stays bounded however large the body is.
+    Consumer (this generator): writes results out as they finish and frees a slot per result.
+
+    Cancellation: DELETE /analyze/batch/{id} (immediate), or the client disconnecting
+    (immediate while the unread body fits in BODY_BUFFER_BYTES, otherwise delayed, see
+    BodyBuffer). Positions not yet started are dropped; ones already running stop at their
+    time limit.
+    """
+    results = _batches[batch_id]
+    slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+    running: set = set()
+    total: Optional[int] = None
+    body = BodyBuffer()
+
+    def on_done(index: int, position: PositionDTO, pool: ProcessPoolExecutor, fut: asyncio.Future) -> None:
+        running.discard(fut)
+        if fut.cancelled():
+            return
+        try:
+            results.put_nowait(fut.result())
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                discard_broken_pool(pool)
+            results.put_nowait((AnalysisResultDTO(index=index, id=position.id, error=repr(e)), None))
+
+    async def pump() -> None:
+        # raw receive() rather than request.stream(), so the disconnect is ours to see
+        while True:
+            message = await request.receive()
+            if message["type"] == "http.disconnect":
+                results.put_nowait(_CANCEL)
+                return
+            if body.finished:
+                continue  # after the body only the disconnect is expected
+            chunk = message.get("body", b"")
+            if chunk:
+                await body.put(chunk)
+            if not message.get("more_body", False):
+                await body.finish()
+
+    async def produce() -> None:
+        nonlocal total
+        index = 0
+        async for line in read_lines(body):
+            if line is not None and not line.strip():
+                continue
+
+            await slots.acquire()  # released once this result is written out
+
+            if line is None:
+                error = f"Line longer than {MAX_LINE_BYTES} bytes."
+                results.put_nowait((AnalysisResultDTO(index=index, error=error), None))
+            else:
+                try:
+                    position = parse_position(line)
+                    fut, pool = submit(analyze_position, index, position, depth, time_limit)
+                except Exception as e:
+                    # anything one line can trigger (bad JSON, RecursionError on deep nesting,
+                    # a pool that broke twice in a row) becomes that line's error, never the batch's
+                    error = str(e) if isinstance(e, ValueError) else repr(e)
+                    results.put_nowait((AnalysisResultDTO(index=index, error=error), None))
+                else:
+                    running.add(fut)
+                    fut.add_done_callback(partial(on_done, index, position, pool))
+            index += 1
+
+        total = index
+        results.put_nowait(None)  # wake the consumer so it sees the total
+
+    def on_task_done(task: asyncio.Task) -> None:
+        # a crashed pump/producer would otherwise leave the consumer waiting forever
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("batch %s aborted", batch_id, exc_info=task.exception())
+            results.put_nowait(_CANCEL)
+
+    pumper = asyncio.ensure_future(pump())
+    producer = asyncio.ensure_future(produce())
+    pumper.add_done_callback(on_task_done)
+    producer.add_done_callback(on_task_done)
+    written = 0
+    try:
+        while total is None or written < total:
+            item = await results.get()
+            if item is _CANCEL:
+                break
+            if item is None:
+                continue
+
+            result, stats = item
+            if stats is not None:
+                ai.record_search(stats, result.depth, result.elapsed)
+                if metrics.ENABLED:
+                    metrics.RULES_VALID_MOVES_CALLS.inc(stats.valid_moves_calls)
+            yield _encode(result)
+            written += 1
+            slots.release()
+    finally:
+        producer.cancel()
+        pumper.cancel()
+        for fut in list(running):
+            fut.cancel()
+        _batches.pop(batch_id, None)
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that does not listen for disconnects itself: the stock listener
+    calls receive() concurrently and would swallow request body chunks that
+    stream_batch is still reading. stream_batch's pump watches for the disconnect instead.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            async for chunk in self.body_iterator:
+                if not isinstance(chunk, (bytes, memoryview)):
+                    chunk = chunk.encode(self.charset)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+        if self.background is not None:
+            await self.background()
@@ -1,15 +1,30 @@
-from fastapi import FastAPI, HTTPException
+import copy
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+
+from app import analysis, metrics
 
 from app.game.Game import Game
 from app.game.Rules import Rules
 
+from app.schemas.analysis import AnalysisLineDTO, MultiPVAnalysisDTO
 from app.schemas.game_state import GameStateDTO
 from app.schemas.move import MoveDTO, MovePositionDTO, ValidMovesDTO
 from app.schemas.piece import PieceDTO
 from app.game.ai import choose_best_move
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # wait, so the workers are joined and their semaphores released before we exit
+    analysis.shutdown_pool(wait=True)
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS for React
 app.add_middleware(
@@ -20,6 +35,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# request latency / in-flight metrics (see metrics.RequestMetricsMiddleware)
+app.add_middleware(metrics.RequestMetricsMiddleware)
+
+
 # SINGLE in-memory game
 game = Game.new()
 
@@ -100,3 +119,55 @@ def reset():
     global game
     game = Game.new()
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(content=metrics.REGISTRY.exposition(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/analysis", response_model=MultiPVAnalysisDTO)
+def get_analysis(
+    k: int = Query(3, ge=1, le=64),
+    depth: int = Query(3, ge=1, le=analysis.MAX_DEPTH),  # depth 3 finishes in ~7s from the opening
+    time_limit: float = Query(10.0, gt=0, le=analysis.MAX_TIME_LIMIT),
+):
+    # top-k root moves for the side to move in the current game
+    snapshot = copy.deepcopy(game)  # /move may change the global game while we search
+    searched, lines, cached = analysis.analyze_lines(snapshot, depth, time_limit)
+
+    return MultiPVAnalysisDTO(
+        depth=searched,
+        cached=cached,
+        lines=[
+            AnalysisLineDTO(
+                move=analysis.move_dto(move),
+                score=score,
+                pv=[analysis.move_dto(m) for m in pv],
+            )
+            for move, score, pv in lines[:k]
+        ],
+    )
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(
+    request: Request,
+    depth: int = Query(3, ge=1, le=analysis.MAX_DEPTH),
+    time_limit: float = Query(10.0, gt=0, le=analysis.MAX_TIME_LIMIT),
+):
+    # body: one PositionDTO per line (NDJSON); response: one AnalysisResultDTO per line
+    batch_id = analysis.new_batch()
+    return analysis.NDJSONStreamingResponse(
+        analysis.stream_batch(request, batch_id, depth, time_limit),
+        headers={"X-Batch-Id": batch_id},
+    )
+
+
+@app.delete("/analyze/batch/{batch_id}")
+async def cancel_analyze_batch(batch_id: str):
+    # async on purpose: the batch queues belong to the event loop thread
+    if not analysis.cancel_batch(batch_id):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {"status": "cancelled"}
+
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from typing import Optional
 
 from app.game.Board import Board
+from app.game.Piece import Piece
 from app.game.Rules import Rules
 from app.game.Setup import setup_pieces
 
@@ -22,6 +23,58 @@ class Game:
         setup_pieces(b)
         return Game(board=b)
 
+    @staticmethod
+    def from_state(
+        pieces: list[Piece],
+        turn: str = "white",
+        forced_color: Optional[str] = None,
+        winner: Optional[str] = None,
+        last_player: Optional[str] = None,
+    ) -> "Game": # rebuild a game from a serialized position
+        if turn not in ("white", "black"):
+            raise ValueError(f"Unknown turn '{turn}'.")
+        if forced_color is not None and forced_color not in Board.COLORS:
+            raise ValueError(f"Unknown forced color '{forced_color}'.")
+        if winner not in (None, "white", "black"):
+            raise ValueError(f"Unknown winner '{winner}'.")
+        if last_player not in (None, "white", "black"):
+            raise ValueError(f"Unknown last player '{last_player}'.")
+
+        # apply_move indexes board.pieces by id, so ids must be exactly 0..n-1
+        ordered = sorted(pieces, key=lambda p: p.id)
+        if [p.id for p in ordered] != list(range(len(ordered))):
+            raise ValueError("Piece ids must be unique and numbered 0..n-1.")
+
+        squares = set()
+        for p in ordered:
+            if p.team not in ("white", "black"):
+                raise ValueError(f"Piece {p.id} has unknown team '{p.team}'.")
+            if p.color not in Board.COLORS:
+                raise ValueError(f"Piece {p.id} has unknown color '{p.color}'.")
+            if not (0 <= p.col < Board.WIDTH and 0 <= p.row < Board.HEIGHT):
+                raise ValueError(f"Piece {p.id} is off the board.")
+            if (p.col, p.row) in squares:
+                raise ValueError(f"Two pieces on square ({p.col}, {p.row}).")
+            squares.add((p.col, p.row))
+
+        b = Board()
+        b.pieces = ordered
+        return Game(
+            board=b,
+            turn=turn,
+            forced_color=forced_color,
+            winner=winner,
+            last_player=last_player,
+        )
+
+    def position_key(self) -> tuple: # hashable identity of the position, used as a cache key
+        return (
+            self.turn,
+            self.forced_color,
+            self.winner,
+            tuple((p.id, p.col, p.row, p.color, p.team) for p in self.board.pieces),
+        )
+
     def allowed_piece_ids(self) -> list[int]: # get the ids of the pieces that are allowed to move
         ids = []
         for p in self.board.pieces:
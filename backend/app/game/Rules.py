@@ -2,6 +2,8 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
 
+from app import metrics
+
 if TYPE_CHECKING:
     from .Piece import Piece
     from .Board import Board
@@ -9,6 +11,9 @@ if TYPE_CHECKING:
 class Rules:
     @staticmethod
     def valid_moves(piece: Piece, board: Board) -> list[tuple[int, int]]:
+        if metrics.ENABLED:
+            metrics.RULES_VALID_MOVES_CALLS.value += 1
+
         moves: list[tuple[int, int]] = []
 
         if piece.team == "white":
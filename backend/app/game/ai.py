@@ -1,6 +1,9 @@
 import copy
-from typing import List, Tuple
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 
+from app import metrics
 from app.game.Game import Game
 from app.game.Rules import Rules
 import logging
@@ -21,6 +24,59 @@ DEBUG = True
 Move = Tuple[int, int, int]
 
 
+@dataclass
+class SearchStats:
+    """
+    PURPOSE:
+      Per-search counters, threaded through minimax instead of kept as globals
+      so concurrent searches do not mix their numbers.
+    """
+    nodes: int = 0
+    interior_nodes: int = 0
+    evals: int = 0
+    cutoffs: int = 0
+    # Rules.valid_moves calls; only filled in by analysis worker processes, whose
+    # RULES_VALID_MOVES_CALLS counter the parent's /metrics cannot see
+    valid_moves_calls: int = 0
+
+    @property
+    def cutoff_rate(self) -> float:
+        if self.interior_nodes == 0:
+            return 0.0
+        return self.cutoffs / self.interior_nodes
+
+
+class SearchTimeout(Exception):
+    """Raised inside minimax once the search deadline has passed."""
+
+
+@dataclass
+class AnalysisResult:
+    best_move: Optional[Move]
+    score: Optional[float]      # from the point of view of the side to move
+    pv: List[Move]              # principal variation, starting with best_move
+    depth: int                  # deepest fully completed iteration
+    stats: SearchStats
+    elapsed: float
+    lines: List[Tuple[Move, float, List[Move]]]  # every root move (see search_root), best first
+    # seconds the iteration after `depth` had before the time limit stopped it (None: not stopped)
+    unfinished_budget: Optional[float] = None
+
+
+def record_search(stats: Optional[SearchStats], depth: int, elapsed: float) -> None:
+    # Publish one finished search to the metrics registry (once per search, not per node)
+    if stats is None or not metrics.ENABLED:
+        return
+    metrics.AI_SEARCHES.inc()
+    metrics.AI_SEARCH_DURATION.observe(elapsed, (str(depth),))
+    metrics.AI_NODES.inc(stats.nodes)
+    metrics.AI_EVAL_CALLS.inc(stats.evals)
+    metrics.AI_CUTOFFS.inc(stats.cutoffs)
+    metrics.AI_CUTOFF_RATE.set(stats.cutoff_rate)
+    if elapsed > 0:
+        metrics.AI_NODES_PER_SECOND.set(stats.nodes / elapsed)
+
+
 def get_all_legal_moves(game: Game) -> List[Move]:
     """
     PURPOSE:
@@ -195,7 +251,10 @@ def minimax(
     alpha: float,
     beta: float,
     ai_team: str,
-    indent: int = 0
+    indent: int = 0,
+    stats: Optional[SearchStats] = None,
+    pv: Optional[List[Move]] = None,
+    deadline: Optional[float] = None,
 ) -> float:
     """
     PURPOSE:
@@ -207,6 +266,9 @@ def minimax(
       alpha/beta  : pruning boundaries (speed optimization)
       maximizing  : True if it's AI's "best choice" turn in this recursion layer
       ai_team     : which side is AI ("white" or "black")
+      stats       : optional SearchStats that collects nodes / evals / cutoffs
+      pv          : optional list, filled with the best line found from this node
+      deadline    : optional time.perf_counter() value; past it we raise SearchTimeout
 
     RETURNS:
       A float score representing how good this position is for ai_team.
@@ -216,16 +278,28 @@ def minimax(
     prefix = "  " * indent
     print(f"{prefix}Depth: {depth}, Turn: {game.turn}, ")
 
+    if stats is not None:
+        stats.nodes += 1
+
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout()
 
     if depth == 0 or game.winner:
+        if stats is not None:
+            stats.evals += 1
         return evaluate(game, ai_team)
 
     moves = get_all_legal_moves(game)
 
     # no moves? then treat it like a leaf
     if not moves:
+        if stats is not None:
+            stats.evals += 1
         return evaluate(game, ai_team)
 
+    if stats is not None:
+        stats.interior_nodes += 1
+
     if game.turn == ai_team:
 
         max_eval = float("-inf")
@@ -237,10 +311,13 @@ def minimax(
             g2.apply_move(*move)
 
             # Recursively evaluate next state:
-            eval_score = minimax(g2, depth - 1, alpha, beta, ai_team, indent + 1)
+            child_pv: Optional[List[Move]] = [] if pv is not None else None
+            eval_score = minimax(g2, depth - 1, alpha, beta, ai_team, indent + 1, stats, child_pv, deadline)
             print(f"{prefix}Move {move} → Score {eval_score}")
 
-            # Keep best score
+            # Keep best score (and the line that leads to it)
+            if pv is not None and eval_score > max_eval:
+                pv[:] = [move] + child_pv
             max_eval = max(max_eval, eval_score)
 
             # Update alpha
@@ -251,6 +328,8 @@ def minimax(
             # If alpha >= beta, opponent will avoid this branch, so stop exploring
         
             if beta <= alpha:
+              if stats is not None:
+                    stats.cutoffs += 1
               if DEBUG:
                     logger.info(f"Pruned branch at depth {depth}")
               break
@@ -266,11 +345,18 @@ def minimax(
             g2 = copy.deepcopy(game)
             g2.apply_move(*move)
 
-            eval_score = minimax(g2, depth - 1, alpha, beta, ai_team)
+            child_pv = [] if pv is not None else None
+            eval_score = minimax(
+                g2, depth - 1, alpha, beta, ai_team, stats=stats, pv=child_pv, deadline=deadline
+            )
 
+            if pv is not None and eval_score < min_eval:
+                pv[:] = [move] + child_pv
             min_eval = min(min_eval, eval_score)
             beta = min(beta, eval_score)
             if beta <= alpha:
+              if stats is not None:
+                    stats.cutoffs += 1
               if DEBUG:
                     logger.info(f"Pruned branch at depth {depth}")
               break
@@ -283,6 +369,9 @@ def choose_best_move(game: Game, ai_team: str, depth: int = 5) -> Move | None:
 
     best_score = float("-inf")
     best_move: Move | None = None
+    # no stats object when metrics are off, so minimax skips its per-node bookkeeping
+    stats = SearchStats() if metrics.ENABLED else None
+    started = time.perf_counter()
 
     moves = get_all_legal_moves(game)
     logger.info(f"\nAI ({ai_team}) evaluating {len(moves)} moves at depth {depth}")
@@ -299,7 +388,8 @@ def choose_best_move(game: Game, ai_team: str, depth: int = 5) -> Move | None:
             depth - 1,
             float("-inf"),
             float("inf"),
-            ai_team
+            ai_team,
+            stats=stats,
         )
         logger.info(f"Move {move} → Score {score}")
 
@@ -311,4 +401,101 @@ def choose_best_move(game: Game, ai_team: str, depth: int = 5) -> Move | None:
     logger.info(f"BEST MOVE: {best_move}")
     logger.info(f"BEST SCORE: {best_score}")
     logger.info("-" * 40)
-    return best_move
\ No newline at end of file
+
+    record_search(stats, depth, time.perf_counter() - started)
+    return best_move
+
+
+def search_root(
+    game: Game,
+    depth: int,
+    stats: Optional[SearchStats] = None,
+    deadline: Optional[float] = None,
+) -> List[Tuple[Move, float, List[Move]]]:
+    """
+    PURPOSE:
+      Score EVERY root move for the side to move, each with a full (-inf, inf) window
+      so the scores are exact, not just bounds.
+
+    RETURNS:
+      [(move, score, pv), ...] sorted best first (ties keep move-generation order).
+      pv starts with the root move itself.
+    """
+    ai_team = game.turn
+    lines: List[Tuple[Move, float, List[Move]]] = []
+
+    for move in get_all_legal_moves(game):
+        g2 = copy.deepcopy(game)
+        g2.apply_move(*move)
+
+        child_pv: List[Move] = []
+        score = minimax(
+            g2,
+            depth - 1,
+            float("-inf"),
+            float("inf"),
+            ai_team,
+            stats=stats,
+            pv=child_pv,
+            deadline=deadline,
+        )
+        lines.append((move, score, [move] + child_pv))
+
+    lines.sort(key=lambda line: line[1], reverse=True)
+    return lines
+
+
+def analyze(
+    game: Game,
+    depth: int,
+    time_limit: Optional[float] = None,
+    known: Optional[Tuple[int, List[Tuple[Move, float, List[Move]]]]] = None,
+) -> AnalysisResult:
+    """
+    PURPOSE:
+      Analyse a position for the side to move: best move, score, PV and node count.
+
+    HOW:
+      Iterative deepening 1..depth. If time_limit (seconds) runs out mid-iteration,
+      that iteration is thrown away and the last completed one is returned.
+      Depth 1 always completes so there is an answer whenever a legal move exists.
+
+      known = (depth, lines) from an earlier search of this position (e.g. a cache):
+      deepening then starts right after that depth instead of redoing it.
+    """
+    stats = SearchStats()
+    started = time.perf_counter()
+    deadline = started + time_limit if time_limit else None
+
+    lines: List[Tuple[Move, float, List[Move]]] = []
+    completed = 0
+    if known is not None and known[1]:
+        completed, lines = known
+
+    unfinished_budget: Optional[float] = None
+    first = completed + 1
+
+    for d in range(first, depth + 1):
+        iteration_started = time.perf_counter()
+        try:
+            # the first iteration runs without a deadline so there is always an answer
+            found = search_root(game, d, stats, deadline if completed > 0 else None)
+        except SearchTimeout:
+            # the first iteration of this call had the whole limit (minus setup noise)
+            unfinished_budget = time_limit if d == first else deadline - iteration_started
+            break
+        if not found:
+            # nothing to move (game over): no depth was searched, and deeper won't change that
+            break
+        lines = found
+        completed = d
+
+    elapsed = time.perf_counter() - started
+
+    if not lines:
+        # game over / no legal moves: report the static evaluation
+        stats.evals += 1
+        return AnalysisResult(None, evaluate(game, game.turn), [], completed, stats, elapsed, [])
+
+    best_move, score, pv = lines[0]
+    return AnalysisResult(best_move, score, pv, completed, stats, elapsed, lines, unfinished_budget)
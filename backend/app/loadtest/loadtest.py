@@ -0,0 +1,528 @@
+# backend/app/loadtest/loadtest.py
+# Load generator for the FastAPI backend.
+#
+# Simulates N concurrent players, each on its own keep-alive connection, playing through
+# /state -> /valid-moves -> /move (or /ai-move) with think times, and reports per-endpoint
+# latency percentiles, throughput, error rates and server CPU / RSS.
+#
+# Run from backend/:
+#   python -m app.loadtest.loadtest --clients 20 --duration 60 --out results.json
+#   python -m app.loadtest.loadtest --scenario scenario.json --compare baseline.json
+#
+# Server modes:
+#   subprocess (default) : start uvicorn app.main:app on a free localhost port
+#   inprocess            : run uvicorn in a thread of this process (client and server share CPU)
+#                          engine stdout is silenced and logging goes to --server-log while it runs
+#   external             : hit --url; pass --server-pid to also sample its CPU / RSS
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field, fields
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+try:
+    import psutil
+except ImportError:  # fall back to /proc (Linux only)
+    psutil = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@dataclass
+class Scenario:
+    name: str = "default"
+    clients: int = 10
+    duration: float = 30.0          # seconds of measured load
+    warmup: float = 2.0             # seconds of load before measuring starts
+    think_min: float = 0.2          # seconds a player "thinks" between actions
+    think_max: float = 1.5
+    ai_ratio: float = 0.1           # share of turns played with /ai-move instead of /move
+    seed: Optional[int] = None
+    timeout: float = 120.0          # per request; /ai-move at depth 5 can take a while
+
+    @staticmethod
+    def from_dict(data: dict) -> "Scenario":
+        known = {f.name for f in fields(Scenario)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown scenario keys: {sorted(unknown)}")
+        return Scenario(**data)
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)  # seconds, successful + conflicts
+    errors: int = 0       # 5xx and transport failures
+    conflicts: int = 0    # 4xx: expected, all players share the server's single game
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.measuring = False
+        self.games_finished = 0
+
+    def record(self, endpoint: str, elapsed: float, status: Optional[int]) -> None:
+        if not self.measuring:
+            return
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            if status is None or status >= 500:
+                stats.errors += 1
+                return
+            stats.latencies.append(elapsed)
+            if status >= 400:
+                stats.conflicts += 1
+
+    def game_finished(self) -> None:
+        if self.measuring:
+            with self._lock:
+                self.games_finished += 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    # nearest-rank percentile
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ResourceSampler(threading.Thread):
+    """Samples CPU% and RSS of one process every `interval` seconds."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu: List[float] = []   # percent of one core
+        self.rss: List[float] = []   # MB
+        self._stop_event = threading.Event()
+        self._proc = psutil.Process(pid) if psutil else None
+
+    def _cpu_seconds(self) -> float:
+        if self._proc is not None:
+            t = self._proc.cpu_times()
+            return t.user + t.system
+        with open(f"/proc/{self.pid}/stat") as f:
+            parts = f.read().rsplit(")", 1)[1].split()
+        return (int(parts[11]) + int(parts[12])) / os.sysconf("SC_CLK_TCK")  # utime + stime
+
+    def _rss_mb(self) -> float:
+        if self._proc is not None:
+            return self._proc.memory_info().rss / 1024 / 1024
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    def run(self) -> None:
+        try:
+            last_cpu, last_wall = self._cpu_seconds(), time.perf_counter()
+            while not self._stop_event.wait(self.interval):
+                cpu, wall = self._cpu_seconds(), time.perf_counter()
+                self.cpu.append((cpu - last_cpu) / (wall - last_wall) * 100)
+                self.rss.append(self._rss_mb())
+                last_cpu, last_wall = cpu, wall
+        except (OSError, ValueError) as e:  # process gone or /proc unavailable
+            print(f"resource sampling stopped: {e}", file=sys.stderr)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def summary(self) -> dict:
+        def stats(values: List[float]) -> dict:
+            if not values:
+                return {"avg": None, "max": None}
+            return {"avg": round(sum(values) / len(values), 2), "max": round(max(values), 2)}
+        return {"cpu_percent": stats(self.cpu), "rss_mb": stats(self.rss), "samples": len(self.cpu)}
+
+
+class Player(threading.Thread):
+    """One simulated player with its own keep-alive HTTP connection."""
+
+    def __init__(self, base_url: str, scenario: Scenario, recorder: Recorder, stop: threading.Event, seed: int):
+        super().__init__(daemon=True)
+        url = urlparse(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.scenario = scenario
+        self.recorder = recorder
+        self.stop_event = stop
+        self.rng = random.Random(seed)
+        self.conn: Optional[http.client.HTTPConnection] = None
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def request(self, method: str, path: str, endpoint: str, body: Optional[dict] = None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+
+        for attempt in range(2):
+            reused = self.conn is not None
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.scenario.timeout)
+
+            started = time.perf_counter()
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                resp = self.conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Maybe the server closed the idle keep-alive socket, which is not this request's
+                # fault. Only a GET is safe to resend: a POST may have reached the server already
+                # (a /move applied twice is a different game), so its failure counts as an error.
+                self.close()
+                if reused and attempt == 0 and method == "GET":
+                    continue
+                self.recorder.record(endpoint, time.perf_counter() - started, None)
+                return None, None
+            except (OSError, http.client.HTTPException):
+                self.recorder.record(endpoint, time.perf_counter() - started, None)
+                self.close()
+                return None, None
+
+        self.recorder.record(endpoint, time.perf_counter() - started, resp.status)
+        if resp.status >= 500:
+            # uvicorn drops the connection after a 5xx without sending "Connection: close"
+            self.close()
+        if resp.status >= 400:
+            return resp.status, None
+        return resp.status, json.loads(data) if data else None
+
+    def think(self) -> None:
+        self.stop_event.wait(self.rng.uniform(self.scenario.think_min, self.scenario.think_max))
+
+    def play_turn(self) -> None:
+        _, state = self.request("GET", "/state", "/state")
+        if state is None:
+            return
+
+        if state["winner"]:
+            self.recorder.game_finished()
+            self.request("POST", "/reset", "/reset")
+            return
+
+        if self.rng.random() < self.scenario.ai_ratio:
+            self.request("POST", "/ai-move", "/ai-move")
+            return
+
+        # like the UI: look at the movable pieces, then pick a destination
+        candidates = [
+            p["id"] for p in state["pieces"]
+            if p["team"] == state["turn"]
+            and (state["forced_color"] is None or p["color"] == state["forced_color"])
+        ]
+        self.rng.shuffle(candidates)
+
+        for pid in candidates:
+            _, valid = self.request("GET", f"/valid-moves/{pid}", "/valid-moves/{piece_id}")
+            if valid and valid["moves"]:
+                dest = self.rng.choice(valid["moves"])
+                self.think()
+                self.request(
+                    "POST", "/move", "/move",
+                    {"piece_id": pid, "to_col": dest["col"], "to_row": dest["row"]},
+                )
+                return
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            self.play_turn()
+            self.think()
+        self.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(base_url: str, timeout: float = 30.0) -> None:
+    url = urlparse(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=2)
+            conn.request("GET", "/state")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready in {timeout}s")
+
+
+class Server:
+    """Starts (or attaches to) the server under test."""
+
+    def __init__(self, mode: str, url: Optional[str], pid: Optional[int], log_path: Optional[str] = None):
+        self.mode = mode
+        self.url = url
+        self.pid = pid
+        self.log_path = log_path
+        self._proc: Optional[subprocess.Popen] = None
+        self._log = None
+        self._uvicorn = None
+        self._thread: Optional[threading.Thread] = None
+        self._stdout = None
+        self._log_handlers: Dict[str, list] = {}
+
+    def start(self) -> None:
+        if self.mode == "external":
+            if not self.url:
+                raise ValueError("--url is required in external mode")
+            wait_until_ready(self.url)
+            return
+
+        port = free_port()
+        self.url = f"http://127.0.0.1:{port}"
+
+        # the engine prints every searched node and logs every cutoff: stdout is dropped,
+        # logs and tracebacks go to a file so our report stays readable
+        if self.log_path is None:
+            fd, self.log_path = tempfile.mkstemp(prefix="kamisado-server-", suffix=".log")
+            os.close(fd)
+        self._log = open(self.log_path, "w")
+        print(f"server log: {self.log_path}")
+
+        if self.mode == "subprocess":
+            self._proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app",
+                 "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+                cwd=BACKEND_DIR,
+                stdout=subprocess.DEVNULL,
+                stderr=self._log,
+            )
+            self.pid = self._proc.pid
+        else:
+            import uvicorn
+            from app.main import app
+
+            config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+
+            # same process: until stop(), drop the engine's prints and point the root and
+            # uvicorn loggers (configured by now) at the log file
+            self._stdout = sys.stdout
+            sys.stdout = open(os.devnull, "w")
+            handler = logging.StreamHandler(self._log)
+            for name in ("", "uvicorn", "uvicorn.error", "uvicorn.access"):
+                log = logging.getLogger(name)
+                self._log_handlers[name] = log.handlers[:]
+                log.handlers = [handler]
+
+            self._uvicorn = uvicorn.Server(config)
+            self._thread = threading.Thread(target=self._uvicorn.run, daemon=True)
+            self._thread.start()
+            self.pid = os.getpid()
+
+        wait_until_ready(self.url)
+
+    def stop(self) -> None:
+        if self._proc is not None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        if self._uvicorn is not None:
+            self._uvicorn.should_exit = True
+            self._thread.join(timeout=10)
+        if self._stdout is not None:
+            sys.stdout.close()
+            sys.stdout = self._stdout
+            for name, handlers in self._log_handlers.items():
+                logging.getLogger(name).handlers = handlers
+        if self._log is not None:
+            self._log.close()
+
+
+def run(scenario: Scenario, server: Server) -> dict:
+    server.start()
+    try:
+        recorder = Recorder()
+        stop = threading.Event()
+        seed = scenario.seed if scenario.seed is not None else random.randrange(2**32)
+        players = [
+            Player(server.url, scenario, recorder, stop, seed + i)
+            for i in range(scenario.clients)
+        ]
+        for p in players:
+            p.start()
+
+        time.sleep(scenario.warmup)
+
+        sampler = ResourceSampler(server.pid) if server.pid else None
+        if sampler:
+            sampler.start()
+        recorder.measuring = True
+        started = time.perf_counter()
+
+        time.sleep(scenario.duration)
+
+        recorder.measuring = False
+        elapsed = time.perf_counter() - started
+        if sampler:
+            sampler.stop()
+
+        stop.set()
+        # one deadline for all players: each is at most one request (scenario.timeout) from done
+        join_deadline = time.monotonic() + scenario.timeout
+        for p in players:
+            p.join(timeout=max(0.0, join_deadline - time.monotonic()))
+    finally:
+        server.stop()
+
+    endpoints = {}
+    total_requests = 0
+    total_errors = 0
+    for name, stats in sorted(recorder.endpoints.items()):
+        lat = sorted(stats.latencies)
+        count = len(lat) + stats.errors
+        total_requests += count
+        total_errors += stats.errors
+        endpoints[name] = {
+            "requests": count,
+            "throughput_rps": round(count / elapsed, 2),
+            "errors": stats.errors,
+            "error_rate": round(stats.errors / count, 4) if count else 0.0,
+            "conflicts": stats.conflicts,
+            "latency_ms": {
+                "p50": round(percentile(lat, 50) * 1000, 2),
+                "p95": round(percentile(lat, 95) * 1000, 2),
+                "p99": round(percentile(lat, 99) * 1000, 2),
+                "mean": round(sum(lat) / len(lat) * 1000, 2) if lat else 0.0,
+                "max": round(lat[-1] * 1000, 2) if lat else 0.0,
+            },
+        }
+
+    return {
+        "scenario": asdict(scenario) | {"seed": seed},
+        "environment": {
+            "mode": server.mode,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "git_rev": git_rev(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "duration_s": round(elapsed, 2),
+        "totals": {
+            "requests": total_requests,
+            "throughput_rps": round(total_requests / elapsed, 2),
+            "errors": total_errors,
+            "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+            "games_finished": recorder.games_finished,
+        },
+        "endpoints": endpoints,
+        "server": sampler.summary() if sampler else None,
+    }
+
+
+def git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def print_report(result: dict, baseline: Optional[dict] = None) -> None:
+    def delta(new: float, old: Optional[float]) -> str:
+        if old in (None, 0):
+            return ""
+        return f" ({(new - old) / old * 100:+.1f}%)"
+
+    base_eps = baseline["endpoints"] if baseline else {}
+    print(f"\nScenario '{result['scenario']['name']}': {result['scenario']['clients']} clients, "
+          f"{result['duration_s']}s, rev {result['environment']['git_rev']}")
+    print(f"{'endpoint':<26}{'reqs':>7}{'rps':>9}{'err%':>7}{'4xx':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, ep in result["endpoints"].items():
+        lat = ep["latency_ms"]
+        print(f"{name:<26}{ep['requests']:>7}{ep['throughput_rps']:>9}{ep['error_rate'] * 100:>7.2f}"
+              f"{ep['conflicts']:>6}{lat['p50']:>10}{lat['p95']:>10}{lat['p99']:>10}")
+        old = base_eps.get(name)
+        if old:
+            print(f"{'  vs baseline':<26}{'':>7}{delta(ep['throughput_rps'], old['throughput_rps']):>9}{'':>13}"
+                  f"{delta(lat['p50'], old['latency_ms']['p50']):>10}"
+                  f"{delta(lat['p95'], old['latency_ms']['p95']):>10}"
+                  f"{delta(lat['p99'], old['latency_ms']['p99']):>10}")
+
+    totals = result["totals"]
+    print(f"total: {totals['requests']} requests, {totals['throughput_rps']} req/s, "
+          f"error rate {totals['error_rate'] * 100:.2f}%, {totals['games_finished']} games finished")
+    if result["server"]:
+        s = result["server"]
+        print(f"server: cpu avg {s['cpu_percent']['avg']}% max {s['cpu_percent']['max']}%, "
+              f"rss avg {s['rss_mb']['avg']} MB max {s['rss_mb']['max']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Kamisado backend.")
+    parser.add_argument("--scenario", help="scenario JSON file; CLI flags override its values")
+    parser.add_argument("--save-scenario", help="write the effective scenario to this JSON file")
+    parser.add_argument("--mode", choices=["subprocess", "inprocess", "external"], default="subprocess")
+    parser.add_argument("--url", help="server URL for external mode, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--server-pid", type=int, help="pid to sample CPU / RSS from in external mode")
+    parser.add_argument("--server-log", help="file for the server's logs (default: a temp file)")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    for f in fields(Scenario):
+        kind = str if f.name == "name" else (int if f.name in ("clients", "seed") else float)
+        parser.add_argument(f"--{f.name.replace('_', '-')}", dest=f.name, type=kind)
+    args = parser.parse_args()
+
+    data = {}
+    if args.scenario:
+        with open(args.scenario) as fh:
+            data = json.load(fh)
+    for f in fields(Scenario):
+        value = getattr(args, f.name)
+        if value is not None:
+            data[f.name] = value
+    scenario = Scenario.from_dict(data)
+
+    if args.save_scenario:
+        with open(args.save_scenario, "w") as fh:
+            json.dump(asdict(scenario), fh, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+
+    result = run(scenario, Server(args.mode, args.url, args.server_pid, args.server_log))
+    print_report(result, baseline)
+
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
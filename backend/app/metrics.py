@@ -0,0 +1,364 @@
+# backend/app/metrics.py
+# Tiny in-process metrics registry with Prometheus text exposition.
+# No external service: everything lives in this process and is scraped via GET /metrics.
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# Toggle: KAMISADO_METRICS=0 disables collection. Hot paths check ENABLED before touching
+# any metric, so a disabled registry costs one attribute lookup per call.
+ENABLED: bool = os.getenv("KAMISADO_METRICS", "1").lower() not in ("0", "false", "no", "off")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def set_enabled(enabled: bool) -> None:
+    global ENABLED
+    ENABLED = enabled
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: LabelValues) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.TYPE}",
+        ]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, labels: LabelValues = ()) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, labels: LabelValues = ()) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in items
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class FastCounter(_Metric):
+    """
+    Unlabelled counter for the engine's hot loop: callers bump `.value` directly,
+    with no lock and no label tuple. Concurrent threads may lose an increment now
+    and then, which is fine for a call-count.
+    """
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def get(self) -> int:
+        return self.value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self.value}"]
+
+    def reset(self) -> None:
+        self.value = 0
+
+
+class Gauge(_Metric):
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, labels: LabelValues = ()) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, labels: LabelValues = ()) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, labels: LabelValues = ()) -> None:
+        self.inc(-amount, labels)
+
+    def get(self, labels: LabelValues = ()) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in items
+        ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(_Metric):
+    TYPE = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)  # first bucket with upper bound >= value
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[idx] += 1
+            self._sums[key] += value
+
+    def count(self, labels: LabelValues = ()) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v), self._sums[k]) for k, v in self._counts.items())
+
+        lines: List[str] = []
+        bucket_names = self.labelnames + ("le",)
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(bucket_names, key + (_format_value(bound),))} {cumulative}"
+                )
+            label_str = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def fast_counter(self, name: str, documentation: str) -> FastCounter:
+        return self.register(FastCounter(name, documentation))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def reset(self) -> None:
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def exposition(self) -> str:
+        # Prometheus text format 0.0.4
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- HTTP ---
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "kamisado_http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "kamisado_http_requests_in_flight",
+    "HTTP requests currently being served.",
+)
+
+# --- AI search ---
+AI_SEARCH_DURATION = REGISTRY.histogram(
+    "kamisado_ai_search_duration_seconds",
+    "Wall time of one choose_best_move search.",
+    ("depth",),
+)
+AI_SEARCHES = REGISTRY.counter(
+    "kamisado_ai_searches_total",
+    "Completed AI searches.",
+)
+AI_NODES = REGISTRY.counter(
+    "kamisado_ai_nodes_total",
+    "Minimax nodes searched.",
+)
+AI_EVAL_CALLS = REGISTRY.counter(
+    "kamisado_ai_eval_calls_total",
+    "Static evaluation calls.",
+)
+AI_CUTOFFS = REGISTRY.counter(
+    "kamisado_ai_cutoffs_total",
+    "Alpha-beta cutoffs.",
+)
+AI_NODES_PER_SECOND = REGISTRY.gauge(
+    "kamisado_ai_nodes_per_second",
+    "Search speed of the most recent AI search.",
+)
+AI_CUTOFF_RATE = REGISTRY.gauge(
+    "kamisado_ai_cutoff_rate",
+    "Cutoffs per interior node in the most recent AI search.",
+)
+
+# --- Rules ---
+RULES_VALID_MOVES_CALLS = REGISTRY.fast_counter(
+    "kamisado_rules_valid_moves_calls_total",
+    "Calls to Rules.valid_moves.",
+)
+
+# --- Analysis cache ---
+ANALYSIS_CACHE_HITS = REGISTRY.counter(
+    "kamisado_analysis_cache_hits_total",
+    "GET /analysis requests answered from the cache.",
+)
+ANALYSIS_CACHE_MISSES = REGISTRY.counter(
+    "kamisado_analysis_cache_misses_total",
+    "GET /analysis requests that had to search.",
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Plain ASGI middleware for request latency and in-flight count.
+
+    It records when the inner app returns, i.e. after the last body chunk is sent, so a
+    streamed response (POST /analyze/batch) is measured for its whole duration, not just
+    until its headers go out.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the router stores the matched route in this same scope dict; label by its
+            # template (/valid-moves/{piece_id}), not the raw path, to keep cardinality bounded
+            route_label = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                (scope["method"], route_label, str(status)),
+            )
+            HTTP_REQUESTS_IN_FLIGHT.dec()
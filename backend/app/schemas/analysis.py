@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from app.schemas.move import MoveDTO
+from app.schemas.piece import PieceDTO
+
+class PositionDTO(BaseModel):
+    id: Optional[str] = None  # caller's tag, echoed back in the result
+    turn: str
+    forced_color: Optional[str] = None
+    winner: Optional[str] = None
+    pieces: List[PieceDTO]
+    last_player: Optional[str] = None
+
+class AnalysisResultDTO(BaseModel):
+    index: int  # position number in the request body (0-based, blank lines skipped)
+    id: Optional[str] = None
+    best_move: Optional[MoveDTO] = None
+    score: Optional[float] = None
+    pv: List[MoveDTO] = []
+    depth: int = 0
+    nodes: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+class AnalysisLineDTO(BaseModel):
+    move: MoveDTO
+    score: float
+    pv: List[MoveDTO]
+
+class MultiPVAnalysisDTO(BaseModel):
+    depth: int  # depth actually searched: deeper if a deeper result was cached, shallower if time ran out
+    cached: bool
+    lines: List[AnalysisLineDTO]